@@ -5,6 +5,11 @@ import base64
 import io
 from bill_analyzer import BillAnalyzer
 from split_calculator import SplitCalculator
+import os
+import uuid
+from session_store import SESSION_KEYS, MemorySessionStore, SQLiteSessionStore, KeyValueSessionStore
+from menu_catalog import MenuCatalog
+from bill_rows import tag_extracted_rows, merge_region_items, row_id_of
 
 # Configure page
 st.set_page_config(
@@ -13,8 +18,47 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_session_store():
+    """Create the process-wide session store selected by BILLEASE_SESSION_STORE"""
+    ttl = float(os.getenv("BILLEASE_SESSION_TTL", str(6 * 60 * 60)))
+    backend = os.getenv("BILLEASE_SESSION_STORE", "memory")
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("BILLEASE_SESSION_DB", "billease_sessions.db"), ttl=ttl)
+    if backend == "redis":
+        # Shared store for running several replicas; redis is only needed for this backend
+        import redis
+        client = redis.Redis.from_url(os.getenv("BILLEASE_REDIS_URL", "redis://localhost:6379/0"))
+        return KeyValueSessionStore(client, ttl=ttl)
+    if backend == "memory":
+        return MemorySessionStore(ttl=ttl)
+    raise ValueError(f"Unknown BILLEASE_SESSION_STORE {backend!r}, expected memory, sqlite or redis")
+
+@st.cache_resource
+def get_menu_catalog():
+    """Load the process-wide restaurant menu catalog"""
+    return MenuCatalog(os.getenv("BILLEASE_MENU_CATALOG", "billease_menu.json"))
+
+def get_session_id():
+    """Get the session id from the URL, creating one so reloads and other replicas find the same session"""
+    if 'sid' not in st.query_params:
+        st.query_params['sid'] = uuid.uuid4().hex
+    return st.query_params['sid']
+
+def save_session_state():
+    """Persist the current session to the session store"""
+    state = {key: st.session_state[key] for key in SESSION_KEYS if key in st.session_state}
+    get_session_store().save(get_session_id(), state)
+
 def initialize_session_state():
     """Initialize session state variables"""
+    # Restore a session saved by this or another replica
+    if 'session_loaded' not in st.session_state:
+        saved = get_session_store().load(get_session_id()) or {}
+        for key, value in saved.items():
+            st.session_state[key] = value
+        st.session_state.session_loaded = True
+    
     if 'bill_items' not in st.session_state:
         st.session_state.bill_items = []
     if 'people' not in st.session_state:
@@ -29,10 +73,19 @@ def initialize_session_state():
         st.session_state.miscellaneous_charges = 0
     if 'step' not in st.session_state:
         st.session_state.step = 1
+    if 'restaurant' not in st.session_state:
+        st.session_state.restaurant = ""
+    if 'extracted_items' not in st.session_state:
+        st.session_state.extracted_items = []
+    if 'price_warnings' not in st.session_state:
+        st.session_state.price_warnings = []
+    if 'bill_image' not in st.session_state:
+        st.session_state.bill_image = None
 
 def reset_session():
     """Reset all session state variables"""
-    for key in ['bill_items', 'people', 'assignments', 'manual_splits', 'coupon_discount', 'miscellaneous_charges']:
+    for key in ['bill_items', 'people', 'assignments', 'manual_splits', 'coupon_discount', 'miscellaneous_charges',
+                'restaurant', 'extracted_items', 'price_warnings', 'bill_image']:
         if key in st.session_state:
             del st.session_state[key]
     st.session_state.step = 1
@@ -44,6 +97,25 @@ def image_to_base64(image):
     img_str = base64.b64encode(buffer.getvalue()).decode()
     return img_str
 
+def crop_region(image, top, bottom, left=0, right=100):
+    """
+    Crop a region of a bill image given as percentages of its size
+    
+    Args:
+        image (PIL.Image): Full bill image
+        top, bottom (float): Vertical bounds in percent (0-100)
+        left, right (float): Horizontal bounds in percent (0-100)
+        
+    Returns:
+        PIL.Image: Cropped RGB image
+    """
+    width, height = image.size
+    box = (
+        int(width * left / 100), int(height * top / 100),
+        int(width * right / 100), int(height * bottom / 100)
+    )
+    return image.crop(box).convert("RGB")
+
 def auto_split_remaining(item_amount, assigned_people, changed_person, changed_amount):
     """
     Automatically distribute remaining amount among other people when one person changes their amount
@@ -72,6 +144,133 @@ def auto_split_remaining(item_amount, assigned_people, changed_person, changed_a
     
     return result
 
+def apply_manual_split_change(i, item_amount, person):
+    """
+    Widget callback that auto-splits the remaining amount when one person's custom amount changes
+    
+    Args:
+        i (int): Index of the item being split
+        item_amount (float): Total amount of the item
+        person (str): Person whose amount was edited
+    """
+    assigned_people = st.session_state.assignments.get(f"item_{i}", [])
+    changed_amount = st.session_state[f"manual_{i}_{person}"]
+    
+    auto_split = auto_split_remaining(item_amount, assigned_people, person, changed_amount)
+    st.session_state.manual_splits[f"item_{i}"] = auto_split
+    
+    # Push the new amounts into the other inputs before they are redrawn
+    for other, amount in auto_split.items():
+        if other != person:
+            st.session_state[f"manual_{i}_{other}"] = amount
+    st.session_state[f"auto_split_msg_{i}"] = (
+        f"✅ Auto-split applied! Remaining ₹{item_amount - changed_amount:.2f} distributed among others."
+    )
+
+@st.fragment
+def render_item_panel(i, item):
+    """
+    Render the assignment and custom split panel for one item.
+    
+    Runs as a fragment so edits inside the panel only rerun this panel
+    instead of every item on the page.
+    
+    Args:
+        i (int): Index of the item in the bill
+        item (dict): Item with 'item' and 'amount' keys
+    """
+    item_key = f"item_{i}"
+    
+    with st.expander(f"**{item['item']}** - ₹{item['amount']}", expanded=True):
+        
+        # Multi-select for people
+        assigned_people = st.multiselect(
+            f"Who consumed this item?",
+            options=st.session_state.people,
+            default=st.session_state.assignments.get(item_key, []),
+            key=f"assign_{i}"
+        )
+        
+        # Store assignments
+        st.session_state.assignments[item_key] = assigned_people
+        
+        # Update the unassigned set, and rerun the whole page only when it
+        # flips between complete and incomplete so the Calculate button follows
+        was_complete = not st.session_state.unassigned_items
+        if assigned_people:
+            st.session_state.unassigned_items.discard(i)
+        else:
+            st.session_state.unassigned_items.add(i)
+        if was_complete != (not st.session_state.unassigned_items):
+            st.rerun()
+        
+        # Option for manual split
+        if len(assigned_people) > 1:
+            use_manual_split = st.checkbox(
+                f"Use custom split for {item['item']}?",
+                # Restored sessions keep their custom splits switched on
+                value=item_key in st.session_state.manual_splits,
+                key=f"manual_{i}"
+            )
+            
+            if use_manual_split:
+                st.write("Enter custom amounts (must sum to ₹{:.2f}):".format(item['amount']))
+                st.caption("💡 Tip: When you change one person's amount and press Enter, the remaining amount will be automatically distributed among others!")
+                
+                # Initialize manual amounts if not exists, and re-split equally when
+                # people were added or removed so the split always covers exactly
+                # the assigned people and sums to the item amount
+                current_split = st.session_state.manual_splits.get(item_key)
+                resplit = current_split is None or set(current_split) != set(assigned_people)
+                if resplit:
+                    st.session_state.manual_splits[item_key] = {
+                        person: item['amount'] / len(assigned_people) 
+                        for person in assigned_people
+                    }
+                
+                manual_amounts = st.session_state.manual_splits[item_key]
+                
+                # Create input fields for each person
+                for person in assigned_people:
+                    input_key = f"manual_{i}_{person}"
+                    if resplit or input_key not in st.session_state:
+                        st.session_state[input_key] = float(
+                            manual_amounts.get(person, item['amount'] / len(assigned_people))
+                        )
+                    
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        st.number_input(
+                            f"{person}:",
+                            min_value=0.0,
+                            max_value=float(item['amount']),
+                            step=0.01,
+                            key=input_key,
+                            on_change=apply_manual_split_change,
+                            args=(i, item['amount'], person)
+                        )
+                    
+                    with col2:
+                        st.metric("", f"₹{manual_amounts.get(person, 0):.2f}")
+                
+                if f"auto_split_msg_{i}" in st.session_state:
+                    st.success(st.session_state.pop(f"auto_split_msg_{i}"))
+                
+                total_manual = sum(manual_amounts.values())
+                
+                if abs(total_manual - item['amount']) > 0.01:
+                    st.error(f"⚠️ Amounts must sum to ₹{item['amount']:.2f} (current: ₹{total_manual:.2f})")
+                else:
+                    st.success("✅ Custom split saved!")
+            else:
+                # Remove manual split if unchecked
+                if item_key in st.session_state.manual_splits:
+                    del st.session_state.manual_splits[item_key]
+    
+    # Full runs save once at the end of the script
+    if not st.session_state.get('in_full_run'):
+        save_session_state()
+
 def main():
     initialize_session_state()
     
@@ -108,20 +307,38 @@ def main():
             image = Image.open(uploaded_file)
             st.image(image, caption="Uploaded Bill", use_column_width=True)
             
+            restaurant = st.text_input(
+                "Restaurant (optional)",
+                value=st.session_state.restaurant,
+                help="Naming a restaurant you have split before lets BillEase reuse its menu"
+            )
+            
             if st.button("🔍 Analyze Bill", type="primary"):
                 with st.spinner("Analyzing bill with AI... Please wait."):
                     try:
+                        # Keep the upload so Step 2 can re-scan part of it
+                        st.session_state.bill_image = uploaded_file.getvalue()
+                        
                         # Convert image to base64
                         img_base64 = image_to_base64(image)
                         
                         # Initialize bill analyzer
                         analyzer = BillAnalyzer()
                         
-                        # Extract items from bill
-                        items = analyzer.extract_items(img_base64)
+                        # Extract items from bill, hinting known items for repeat restaurants
+                        catalog = get_menu_catalog()
+                        items = analyzer.extract_items(img_base64, menu_hint=catalog.menu_hint(restaurant))
                         
                         if items:
-                            st.session_state.bill_items = items
+                            # Fix names and check prices against the restaurant's menu
+                            restaurant = restaurant.strip() or analyzer.restaurant or ""
+                            normalized_items, price_warnings = catalog.normalize_items(restaurant, items)
+                            bill_items, extracted_items = tag_extracted_rows(items, normalized_items)
+                            
+                            st.session_state.restaurant = restaurant
+                            st.session_state.extracted_items = extracted_items
+                            st.session_state.price_warnings = price_warnings
+                            st.session_state.bill_items = bill_items
                             st.session_state.step = 2
                             st.success(f"✅ Successfully extracted {len(items)} items from the bill!")
                             st.rerun()
@@ -136,6 +353,9 @@ def main():
         st.header("Step 2: Review Extracted Items")
         st.markdown("Please review the items extracted from your bill. You can edit them if needed.")
         
+        for warning in st.session_state.price_warnings:
+            st.warning(f"⚠️ {warning}")
+        
         if st.session_state.bill_items:
             # Create editable dataframe
             df = pd.DataFrame(st.session_state.bill_items)
@@ -145,12 +365,73 @@ def main():
                 df,
                 column_config={
                     "item": st.column_config.TextColumn("Item Name", width="large"),
-                    "amount": st.column_config.NumberColumn("Amount (₹)", min_value=0.0, step=0.01)
+                    "amount": st.column_config.NumberColumn("Amount (₹)", min_value=0.0, step=0.01),
+                    # Hidden id linking each row to what was extracted
+                    "row_id": None
                 },
                 num_rows="dynamic",
                 use_container_width=True
             )
             
+            # Re-extract only part of the bill instead of re-analyzing the whole image
+            if st.session_state.bill_image:
+                with st.expander("🔎 Missing or wrong items? Re-scan part of the bill", expanded=False):
+                    image = Image.open(io.BytesIO(st.session_state.bill_image))
+                    top, bottom = st.slider("Vertical range (%)", 0, 100, (0, 100), key="region_vertical")
+                    left, right = st.slider("Horizontal range (%)", 0, 100, (0, 100), key="region_horizontal")
+                    
+                    if bottom > top and right > left:
+                        region = crop_region(image, top, bottom, left, right)
+                        st.image(region, caption="Region to re-scan")
+                        
+                        if st.button("🔍 Re-scan Region"):
+                            with st.spinner("Re-scanning region... Please wait."):
+                                try:
+                                    analyzer = BillAnalyzer()
+                                    catalog = get_menu_catalog()
+                                    region_items = analyzer.extract_items(
+                                        image_to_base64(region),
+                                        menu_hint=catalog.menu_hint(st.session_state.restaurant),
+                                        region=True
+                                    )
+                                    # Normalize item by item so warnings can be kept for added rows only
+                                    normalized_items, item_warnings = [], []
+                                    for region_item in region_items:
+                                        normalized, warnings = catalog.normalize_items(
+                                            st.session_state.restaurant, [region_item]
+                                        )
+                                        normalized_items.extend(normalized)
+                                        item_warnings.append(warnings)
+                                    region_rows, region_extracted = tag_extracted_rows(
+                                        region_items, normalized_items, len(st.session_state.extracted_items)
+                                    )
+                                    
+                                    # Keep the rows edited so far and only add what is new
+                                    merged_items, added = merge_region_items(
+                                        edited_df.to_dict('records'), region_rows, st.session_state.extracted_items
+                                    )
+                                    added_ids = {row_id_of(row) for row in added}
+                                    st.session_state.bill_items = merged_items
+                                    st.session_state.extracted_items = st.session_state.extracted_items + region_extracted
+                                    st.session_state.price_warnings = st.session_state.price_warnings + [
+                                        warning
+                                        for row, warnings in zip(region_rows, item_warnings) if row['row_id'] in added_ids
+                                        for warning in warnings
+                                    ]
+                                    st.session_state.region_message = (
+                                        f"✅ Added {len(added)} new items "
+                                        f"({len(region_items) - len(added)} already on the list)."
+                                    )
+                                    st.rerun()
+                                
+                                except Exception as e:
+                                    st.error(f"❌ Error re-scanning region: {str(e)}")
+                    else:
+                        st.error("Please select a non-empty region.")
+            
+            if 'region_message' in st.session_state:
+                st.success(st.session_state.pop('region_message'))
+            
             col1, col2 = st.columns([1, 1])
             with col1:
                 if st.button("⬅️ Back to Upload", type="secondary"):
@@ -161,6 +442,11 @@ def main():
                 if st.button("✅ Confirm Items", type="primary"):
                     # Update session state with edited items
                     st.session_state.bill_items = edited_df.to_dict('records')
+                    
+                    # Learn the confirmed menu for the next bill from this restaurant
+                    catalog = get_menu_catalog()
+                    if catalog.learn(st.session_state.restaurant, st.session_state.extracted_items, st.session_state.bill_items):
+                        catalog.save()
                     st.session_state.step = 3
                     st.rerun()
         else:
@@ -242,81 +528,14 @@ def main():
         st.markdown("---")
         
         if st.session_state.bill_items and st.session_state.people:
+            # Track unassigned items so item panels can update it without a full rerun
+            st.session_state.unassigned_items = {
+                i for i in range(len(st.session_state.bill_items))
+                if not st.session_state.assignments.get(f"item_{i}", [])
+            }
+            
             for i, item in enumerate(st.session_state.bill_items):
-                with st.expander(f"**{item['item']}** - ₹{item['amount']}", expanded=True):
-                    
-                    # Multi-select for people
-                    assigned_people = st.multiselect(
-                        f"Who consumed this item?",
-                        options=st.session_state.people,
-                        default=st.session_state.assignments.get(f"item_{i}", []),
-                        key=f"assign_{i}"
-                    )
-                    
-                    # Store assignments
-                    st.session_state.assignments[f"item_{i}"] = assigned_people
-                    
-                    # Option for manual split
-                    if len(assigned_people) > 1:
-                        use_manual_split = st.checkbox(
-                            f"Use custom split for {item['item']}?",
-                            key=f"manual_{i}"
-                        )
-                        
-                        if use_manual_split:
-                            st.write("Enter custom amounts (must sum to ₹{:.2f}):".format(item['amount']))
-                            st.caption("💡 Tip: When you change one person's amount and press Enter, the remaining amount will be automatically distributed among others!")
-                            
-                            # Initialize manual amounts if not exists
-                            if f"item_{i}" not in st.session_state.manual_splits:
-                                st.session_state.manual_splits[f"item_{i}"] = {
-                                    person: item['amount'] / len(assigned_people) 
-                                    for person in assigned_people
-                                }
-                            
-                            manual_amounts = st.session_state.manual_splits[f"item_{i}"].copy()
-                            
-                            # Create input fields for each person
-                            for j, person in enumerate(assigned_people):
-                                col1, col2 = st.columns([3, 1])
-                                with col1:
-                                    amount = st.number_input(
-                                        f"{person}:",
-                                        min_value=0.0,
-                                        max_value=float(item['amount']),
-                                        value=manual_amounts.get(person, item['amount'] / len(assigned_people)),
-                                        step=0.01,
-                                        key=f"manual_{i}_{person}"
-                                    )
-                                    
-                                    # Check if this person's amount changed
-                                    if amount != manual_amounts.get(person, 0):
-                                        # Auto-split remaining amount
-                                        auto_split = auto_split_remaining(
-                                            item['amount'], 
-                                            assigned_people, 
-                                            person, 
-                                            amount
-                                        )
-                                        manual_amounts = auto_split
-                                        st.session_state.manual_splits[f"item_{i}"] = auto_split
-                                        st.success(f"✅ Auto-split applied! Remaining ₹{item['amount'] - amount:.2f} distributed among others.")
-                                        st.rerun()
-                                
-                                with col2:
-                                    st.metric("", f"₹{manual_amounts.get(person, 0):.2f}")
-                            
-                            total_manual = sum(manual_amounts.values())
-                            
-                            if abs(total_manual - item['amount']) > 0.01:
-                                st.error(f"⚠️ Amounts must sum to ₹{item['amount']:.2f} (current: ₹{total_manual:.2f})")
-                            else:
-                                st.session_state.manual_splits[f"item_{i}"] = manual_amounts
-                                st.success("✅ Custom split saved!")
-                        else:
-                            # Remove manual split if unchecked
-                            if f"item_{i}" in st.session_state.manual_splits:
-                                del st.session_state.manual_splits[f"item_{i}"]
+                render_item_panel(i, item)
             
             col1, col2 = st.columns([1, 1])
             with col1:
@@ -326,10 +545,7 @@ def main():
             
             with col2:
                 # Check if all items are assigned
-                all_assigned = all(
-                    st.session_state.assignments.get(f"item_{i}", []) 
-                    for i in range(len(st.session_state.bill_items))
-                )
+                all_assigned = not st.session_state.unassigned_items
                 
                 if st.button("🧮 Calculate Split", type="primary", disabled=not all_assigned):
                     if all_assigned:
@@ -460,4 +676,10 @@ def main():
                     st.rerun()
 
 if __name__ == "__main__":
-    main()
+    st.session_state.in_full_run = True
+    try:
+        main()
+    finally:
+        # Also runs when st.rerun() interrupts the script
+        st.session_state.in_full_run = False
+        save_session_state()
@@ -1,29 +1,194 @@
 import os
 import json
-from openai import OpenAI
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from openai import OpenAI, AsyncOpenAI
 import streamlit as st
 
+logger = logging.getLogger(__name__)
+
+class HedgeStats:
+    """
+    Per-process latency window, hedge budget and counters shared by all
+    BillAnalyzer instances (Streamlit creates a new analyzer on every click)
+    """
+    def __init__(self, window=50, percentile=95, budget_ratio=0.1, max_burst=3.0,
+                 min_samples=10, default_delay=8.0):
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.max_burst = max_burst
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        # Token bucket: each request earns budget_ratio tokens, each hedge spends one
+        self._tokens = 1.0
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.hedges_denied = 0
+    
+    def record_latency(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+    
+    def _percentile(self, p):
+        ordered = sorted(self._latencies)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round((p / 100) * (len(ordered) - 1))))
+        return ordered[index]
+    
+    def hedge_delay(self):
+        """Seconds to wait on the first request before sending a hedge"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.default_delay
+            return self._percentile(self.percentile)
+    
+    def start_request(self):
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.max_burst, self._tokens + self.budget_ratio)
+    
+    def try_acquire_hedge(self):
+        """Spend one hedge from the budget, returning False once it is exhausted"""
+        with self._lock:
+            if self._tokens < 1.0:
+                self.hedges_denied += 1
+                return False
+            self._tokens -= 1.0
+            self.hedges_fired += 1
+            return True
+    
+    def record_hedge_win(self):
+        with self._lock:
+            self.hedges_won += 1
+    
+    def snapshot(self):
+        """
+        Current hedging metrics
+        
+        Returns:
+            dict: Counters, hedge/win rates and rolling latency percentiles
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedges_fired': self.hedges_fired,
+                'hedges_won': self.hedges_won,
+                'hedges_denied': self.hedges_denied,
+                'hedge_rate': self.hedges_fired / self.requests if self.requests else 0.0,
+                'win_rate': self.hedges_won / self.hedges_fired if self.hedges_fired else 0.0,
+                'p50_latency': self._percentile(50),
+                'hedge_latency': self._percentile(self.percentile),
+                'budget_remaining': round(self._tokens, 2)
+            }
+
+hedge_stats = HedgeStats(
+    percentile=float(os.getenv("BILLEASE_HEDGE_PERCENTILE", "95")),
+    budget_ratio=float(os.getenv("BILLEASE_HEDGE_BUDGET", "0.1"))
+)
+
 class BillAnalyzer:
-    def __init__(self):
+    def __init__(self, hedge=None):
         # Get API key from environment variable
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
+        # Hedged requests are opt-in, either per analyzer or via BILLEASE_HEDGE=1
+        if hedge is None:
+            hedge = os.getenv("BILLEASE_HEDGE", "0").lower() in ("1", "true", "yes")
+        self.hedge = hedge
+        self.api_key = api_key
+        
         # the newest OpenAI model is "gpt-5" which was released August 7, 2025.
         # do not change this unless explicitly requested by the user
         self.client = OpenAI(api_key=api_key)
     
-    def extract_items(self, image_base64):
+    def _create_completion(self, **request):
+        """
+        Send a chat completion request, hedging it if enabled
+        
+        Args:
+            **request: Keyword arguments for chat.completions.create
+            
+        Returns:
+            ChatCompletion: The first successful response
+        """
+        hedge_stats.start_request()
+        
+        if not self.hedge:
+            start = time.monotonic()
+            response = self.client.chat.completions.create(**request)
+            hedge_stats.record_latency(time.monotonic() - start)
+            return response
+        
+        response = asyncio.run(self._hedged_completion(request, hedge_stats.hedge_delay()))
+        # Process-wide operator metrics, kept out of the user-facing UI
+        logger.info("Hedged extraction metrics: %s", hedge_stats.snapshot())
+        return response
+    
+    async def _hedged_completion(self, request, delay):
+        """
+        Send the request, and if it is slower than delay send an identical
+        second one, returning whichever finishes first and cancelling the other
+        """
+        async with AsyncOpenAI(api_key=self.api_key) as client:
+            # Latency is measured end to end from the primary's start. When the
+            # hedge wins, this is also how long the cancelled primary had been
+            # running, a lower bound on its latency, so slow requests stay in the window.
+            start = time.monotonic()
+            primary = asyncio.create_task(client.chat.completions.create(**request))
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not hedge_stats.try_acquire_hedge():
+                response = await primary
+                hedge_stats.record_latency(time.monotonic() - start)
+                return response
+            
+            hedge = asyncio.create_task(client.chat.completions.create(**request))
+            pending = {primary, hedge}
+            error = None
+            
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is not None:
+                            error = error or task.exception()
+                            continue
+                        
+                        hedge_stats.record_latency(time.monotonic() - start)
+                        if task is hedge:
+                            hedge_stats.record_hedge_win()
+                        return task.result()
+            finally:
+                # Cancel the loser so its connection is closed rather than awaited
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            
+            raise error
+    
+    def extract_items(self, image_base64, menu_hint=None, region=False):
         """
         Extract items and prices from a bill image using GPT Vision
         
         Args:
             image_base64 (str): Base64 encoded image string
+            menu_hint (str): Optional list of items known for this restaurant
+            region (bool): Whether the image is a cropped part of a bill
             
         Returns:
             list: List of dictionaries with 'item' and 'amount' keys
         """
+        # Restaurant name read from the bill, if the model found one
+        self.restaurant = None
+        
         try:
             # Create the prompt for bill analysis
             system_prompt = """
@@ -35,28 +200,42 @@ class BillAnalyzer:
             3. Clean up OCR mistakes (e.g., "Bulter Nan" → "Butter Naan")
             4. Ensure all prices are numbers (remove currency symbols)
             5. If quantity is mentioned, extract individual item amount
+            6. Read the restaurant name from the header, or use null if there is none
             
-            Return ONLY a JSON array in this exact format:
-            [
-                {"item": "Item Name", "amount": price_as_number},
-                {"item": "Another Item", "amount": price_as_number}
-            ]
+            Return ONLY a JSON object in this exact format:
+            {
+                "restaurant": "Restaurant Name",
+                "items": [
+                    {"item": "Item Name", "amount": price_as_number},
+                    {"item": "Another Item", "amount": price_as_number}
+                ]
+            }
             
             Example output:
-            [
-                {"item": "Paneer Butter Masala", "amount": 180},
-                {"item": "Butter Naan", "amount": 40},
-                {"item": "Sweet Lassi", "amount": 60}
-            ]
+            {
+                "restaurant": "Saravana Bhavan",
+                "items": [
+                    {"item": "Paneer Butter Masala", "amount": 180},
+                    {"item": "Butter Naan", "amount": 40},
+                    {"item": "Sweet Lassi", "amount": 60}
+                ]
+            }
             """
             
             user_prompt = """
             Please analyze this restaurant bill image and extract all food/beverage items with their prices. 
-            Return the results as a JSON array with 'item' and 'amount' fields.
+            Return the results as a JSON object with 'restaurant' and 'items' fields.
             """
             
+            if region:
+                user_prompt += "\nThis image is a cropped part of a bill. Extract only the items whose name and price are fully visible.\n"
+            
+            # Known items for a repeat restaurant let the model fix OCR mistakes directly
+            if menu_hint:
+                user_prompt += f"\nUse these spellings when an item matches one of them. {menu_hint}\n"
+            
             # Make API call to GPT Vision
-            response = self.client.chat.completions.create(
+            response = self._create_completion(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -95,6 +274,9 @@ class BillAnalyzer:
                 
                 # If it's an object with an array inside, extract the array
                 if isinstance(result, dict):
+                    if result.get('restaurant'):
+                        self.restaurant = str(result['restaurant']).strip()
+                    
                     if 'items' in result:
                         items = result['items']
                     elif 'bill_items' in result:
@@ -0,0 +1,101 @@
+import re
+
+def normalize_name(name):
+    """Lowercase a name and collapse everything but letters and digits to single spaces"""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(name).lower()).split())
+
+def trigrams(text):
+    """Set of character trigrams of a normalized name, padded to weight word starts"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def row_id_of(item):
+    """Row id of a Step 2 row, or None for rows the user added (pandas fills those with NaN)"""
+    row_id = item.get('row_id')
+    if row_id is None or row_id != row_id:
+        return None
+    return int(row_id)
+
+def similarity(a, b):
+    """Trigram Jaccard similarity of two normalized names"""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+def names_match(a, b, threshold=0.7):
+    """Whether two normalized names are the same or a likely misspelling of each other"""
+    return a == b or (len(a.split()) == len(b.split()) and similarity(a, b) >= threshold)
+
+def tag_extracted_rows(raw_items, normalized_items, first_row_id=0):
+    """
+    Give extracted rows ids so Step 2 edits can be traced back to what was extracted
+
+    Args:
+        raw_items (list): Items as returned by the model
+        normalized_items (list): The same items after normalize_items
+        first_row_id (int): Id for the first row
+
+    Returns:
+        tuple: (rows for review with 'row_id', extracted records for MenuCatalog.learn)
+    """
+    rows = []
+    extracted = []
+    for row_id, (raw, normalized) in enumerate(zip(raw_items, normalized_items), start=first_row_id):
+        rows.append(dict(normalized, row_id=row_id))
+        extracted.append({'row_id': row_id, 'item': raw['item'], 'amount': raw['amount'], 'shown': normalized['item']})
+    return rows, extracted
+
+def merge_region_items(existing_items, new_items, extracted_items=(), price_tolerance=0.2):
+    """
+    Merge items re-extracted from a region into the current Step 2 rows, skipping duplicates
+
+    A new item duplicates an existing row when its name matches the row's
+    current name or the name it was extracted with, allowing for misspellings,
+    and its amount is within price_tolerance of the row's current or extracted
+    amount. This way rows the user already corrected are not added again.
+    Each existing row absorbs at most one new item, so repeated rows on the
+    bill are kept.
+
+    Args:
+        existing_items (list): Current rows with 'item', 'amount' and optional 'row_id'
+        new_items (list): Items extracted from the region
+        extracted_items (list): Extracted records from tag_extracted_rows
+
+    Returns:
+        tuple: (merged items, list of added items)
+    """
+    extracted_by_id = {}
+    for extracted in extracted_items:
+        row_id = row_id_of(extracted)
+        if row_id is not None:
+            extracted_by_id[row_id] = extracted
+
+    candidates = []
+    for item in existing_items:
+        sources = [item]
+        if row_id_of(item) in extracted_by_id:
+            sources.append(extracted_by_id[row_id_of(item)])
+        names, amounts = set(), []
+        for source in sources:
+            for key in ('item', 'shown'):
+                if isinstance(source.get(key), str) and normalize_name(source[key]):
+                    names.add(normalize_name(source[key]))
+            try:
+                amounts.append(float(source['amount']))
+            except (KeyError, TypeError, ValueError):
+                pass
+        if names:
+            candidates.append((names, amounts))
+
+    added = []
+    for item in new_items:
+        name = normalize_name(item['item'])
+        amount = float(item['amount'])
+        for index, (names, amounts) in enumerate(candidates):
+            if (any(names_match(name, known) for known in names)
+                    and any(abs(amount - known) <= known * price_tolerance for known in amounts)):
+                del candidates[index]
+                break
+        else:
+            added.append(item)
+
+    return list(existing_items) + added, added
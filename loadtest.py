@@ -0,0 +1,211 @@
+"""
+Load test harness for the BillEase Streamlit flow
+
+Drives simulated sessions through all five steps of app.py using
+streamlit.testing's AppTest with generated bills, so it runs locally
+without network access or an OpenAI key.
+
+AppTest cannot upload files, so Step 1 seeds st.session_state with a
+generated bill the same way the "Analyze Bill" button does.
+
+AppTest.run() always reruns the whole script, while in the browser Step 4
+panel edits rerun only that item's fragment. The Step 4 rows are therefore
+reported as full-rerun cost, an upper bound on what users wait for.
+
+Usage:
+    python loadtest.py --items 5,50,500 --people 2,10,100 --sessions 5
+    python loadtest.py --items 50 --people 10 --concurrency 4 --json results.json
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+def make_bill(item_count):
+    """Generate bill items shaped like BillAnalyzer.extract_items output"""
+    return [
+        {'item': f"Item {i + 1}", 'amount': float(50 + (i * 37) % 400)}
+        for i in range(item_count)
+    ]
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round((p / 100) * (len(ordered) - 1))))
+    return ordered[index]
+
+def click(at, label):
+    """Click the button with the given label; the click applies on the next run"""
+    next(button for button in at.button if button.label == label).click()
+
+def run_session(item_count, people_count, edits, timeout):
+    """
+    Drive one session through all five steps
+
+    Args:
+        item_count (int): Number of items on the generated bill
+        people_count (int): Number of people splitting the bill
+        edits (int): Item assignments to time individually in Step 4
+        timeout (float): Per-rerun timeout in seconds
+
+    Returns:
+        dict: Mapping of step name to list of rerun latencies in seconds
+    """
+    latencies = {}
+
+    def timed(step, at):
+        start = time.perf_counter()
+        at.run(timeout=timeout)
+        latencies.setdefault(step, []).append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"{step} failed: {at.exception[0].message}")
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    timed("1. Upload Bill", at)
+
+    # Step 1: seed a generated bill and move on, as the Analyze button would
+    at.session_state.bill_items = make_bill(item_count)
+    at.session_state.step = 2
+    timed("2. Review Items", at)
+
+    click(at, "✅ Confirm Items")
+    timed("2. Review Items", at)
+
+    # Step 3: enter people
+    people = [f"Person {i + 1}" for i in range(people_count)]
+    at.text_input[0].input(", ".join(people))
+    timed("3. Add People", at)
+    click(at, "➡️ Assign Items")
+    timed("3. Add People", at)
+
+    # Step 4: time individual assignments, then assign the rest in one rerun
+    for i in range(item_count):
+        share = [people[(i + k) % people_count] for k in range(min(3, people_count))]
+        at.multiselect(key=f"assign_{i}").set_value(share)
+        if i < edits:
+            timed("4. Assign Items (full rerun)", at)
+
+    if item_count > edits:
+        timed("4. Assign Items (bulk)", at)
+
+    # Custom split on the first item
+    at.checkbox(key="manual_0").check()
+    timed("4. Custom Split (full rerun)", at)
+    at.number_input(key=f"manual_0_{people[0]}").set_value(10.0)
+    timed("4. Custom Split (full rerun)", at)
+
+    click(at, "🧮 Calculate Split")
+    timed("5. View Results", at)
+    if at.session_state.step != 5:
+        raise RuntimeError("Session did not reach Step 5")
+
+    return latencies
+
+def run_scenario(item_count, people_count, sessions, concurrency, edits, timeout, measure_memory):
+    """
+    Run several sessions for one bill size and summarize them
+
+    Returns:
+        dict: Latency percentiles per step, peak memory and throughput
+    """
+    if measure_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(run_session, item_count, people_count, edits, timeout)
+            for _ in range(sessions)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    peak_per_session = None
+    if measure_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Sessions overlap when concurrent, so divide the shared peak
+        peak_per_session = peak / min(concurrency, sessions) / (1024 * 1024)
+
+    steps = {}
+    for latencies in results:
+        for step, values in latencies.items():
+            steps.setdefault(step, []).extend(values)
+
+    rerun_count = sum(len(values) for values in steps.values())
+    return {
+        'items': item_count,
+        'people': people_count,
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'steps': {
+            step: {
+                'reruns': len(values),
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000
+            }
+            for step, values in sorted(steps.items())
+        },
+        'peak_memory_mb_per_session': peak_per_session,
+        'sessions_per_second': sessions / elapsed,
+        'reruns_per_second': rerun_count / elapsed
+    }
+
+def print_report(result):
+    """Print one scenario summary as a table"""
+    print(f"\n=== {result['items']} items, {result['people']} people, "
+          f"{result['sessions']} sessions x{result['concurrency']} ===")
+    print(f"{'Step':<32}{'reruns':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, stats in result['steps'].items():
+        print(f"{step:<32}{stats['reruns']:>8}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    if result['peak_memory_mb_per_session'] is not None:
+        print(f"Peak memory per session: {result['peak_memory_mb_per_session']:.1f} MB")
+    print(f"Throughput: {result['sessions_per_second']:.2f} sessions/s, "
+          f"{result['reruns_per_second']:.1f} reruns/s")
+
+def parse_counts(value):
+    return [int(count) for count in value.split(',') if count.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the BillEase Streamlit flow")
+    parser.add_argument("--items", type=parse_counts, default=[5, 50, 500],
+                        help="Comma-separated bill sizes (default: 5,50,500)")
+    parser.add_argument("--people", type=parse_counts, default=[2, 10, 100],
+                        help="Comma-separated group sizes (default: 2,10,100)")
+    parser.add_argument("--sessions", type=int, default=3, help="Sessions per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Sessions run at the same time")
+    parser.add_argument("--edits", type=int, default=10,
+                        help="Step 4 assignments timed one rerun at a time")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-rerun timeout in seconds")
+    parser.add_argument("--memory", action="store_true",
+                        help="Track peak memory with tracemalloc (slows reruns)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for item_count in args.items:
+        for people_count in args.people:
+            result = run_scenario(
+                item_count, people_count, args.sessions, args.concurrency,
+                args.edits, args.timeout, args.memory
+            )
+            print_report(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
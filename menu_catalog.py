@@ -0,0 +1,280 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+from collections import Counter
+
+from bill_rows import normalize_name, trigrams, similarity, row_id_of
+
+logger = logging.getLogger(__name__)
+
+class RestaurantMenu:
+    """Confirmed items for one restaurant with a trigram index for fuzzy lookup"""
+    def __init__(self, name):
+        self.name = name
+        # normalized name -> {'item', 'amount', 'count'}
+        self.items = {}
+        # normalized OCR/model spelling -> normalized confirmed name
+        self.aliases = {}
+        self._index = {}
+
+    def _index_name(self, key, target):
+        for gram in trigrams(key):
+            self._index.setdefault(gram, set()).add(target)
+
+    def add_item(self, item_name, amount):
+        key = normalize_name(item_name)
+        if not key:
+            return
+        entry = self.items.get(key)
+        if entry is None:
+            self.items[key] = {'item': item_name, 'amount': amount, 'count': 1}
+            self._index_name(key, key)
+        else:
+            entry['item'] = item_name
+            entry['amount'] = amount
+            entry['count'] += 1
+
+    def add_alias(self, raw_name, item_name):
+        raw_key, key = normalize_name(raw_name), normalize_name(item_name)
+        if not raw_key or key not in self.items:
+            return
+        if raw_key == key:
+            # The user kept the extracted name, so any old correction was wrong
+            self.aliases.pop(raw_key, None)
+            return
+        self.aliases[raw_key] = key
+        self._index_name(raw_key, key)
+
+    def lookup(self, item_name, threshold=0.7):
+        """
+        Find the confirmed item closest to a name
+
+        Exact names and learned corrections score 1.0; anything else is a
+        fuzzy trigram match between names with the same number of words, so
+        spelling mistakes match but "Paneer Tikka" never becomes "Paneer Tikka Masala".
+
+        Args:
+            item_name (str): Name as extracted from the bill
+            threshold (float): Minimum trigram similarity (0-1)
+
+        Returns:
+            tuple: (catalog entry, similarity) or (None, 0.0) if nothing is close enough
+        """
+        key = normalize_name(item_name)
+        if key in self.items:
+            return self.items[key], 1.0
+        if key in self.aliases:
+            return self.items[self.aliases[key]], 1.0
+
+        grams = trigrams(key)
+        hits = Counter()
+        for gram in grams:
+            for target in self._index.get(gram, ()):
+                hits[target] += 1
+
+        best, best_score = None, 0.0
+        word_count = len(key.split())
+        for target, shared in hits.items():
+            if len(target.split()) != word_count:
+                continue
+            score = shared / len(grams | trigrams(target))
+            if score > best_score:
+                best, best_score = target, score
+        if best is None or best_score < threshold:
+            return None, 0.0
+        return self.items[best], best_score
+
+    def to_dict(self):
+        return {'name': self.name, 'items': self.items, 'aliases': self.aliases}
+
+    @classmethod
+    def from_dict(cls, data):
+        menu = cls(data['name'])
+        menu.items = data.get('items', {})
+        menu.aliases = data.get('aliases', {})
+        for key in menu.items:
+            menu._index_name(key, key)
+        for raw_key, key in menu.aliases.items():
+            menu._index_name(raw_key, key)
+        return menu
+
+class MenuCatalog:
+    """
+    Per-restaurant menu catalog learned from items confirmed in Step 2
+
+    Used to correct names locally, flag suspicious prices and give the model a
+    compact list of known items for repeat restaurants.
+    """
+    def __init__(self, path="billease_menu.json", price_tolerance=0.2):
+        self.path = path
+        self.price_tolerance = price_tolerance
+        self.restaurants = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    for data in json.load(f):
+                        menu = RestaurantMenu.from_dict(data)
+                        self.restaurants[normalize_name(menu.name)] = menu
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.warning("Could not load menu catalog %s, starting empty: %s", path, e)
+                self.restaurants = {}
+
+    def find_restaurant(self, name):
+        """
+        Find a known restaurant by name, tolerating small spelling differences
+
+        Returns:
+            RestaurantMenu: The matching menu, or None
+        """
+        with self._lock:
+            return self._find_restaurant(name)
+
+    def _find_restaurant(self, name):
+        # Callers must hold self._lock, since learn() adds restaurants concurrently
+        key = normalize_name(name or "")
+        if not key:
+            return None
+        if key in self.restaurants:
+            return self.restaurants[key]
+
+        best, best_score = None, 0.0
+        for other_key, menu in self.restaurants.items():
+            score = similarity(key, other_key)
+            if score > best_score:
+                best, best_score = menu, score
+        return best if best_score >= 0.6 else None
+
+    def menu_hint(self, restaurant, limit=40):
+        """
+        Build a compact prompt hint listing a known restaurant's items
+
+        Returns:
+            str: Hint text, or None for unknown restaurants
+        """
+        with self._lock:
+            menu = self._find_restaurant(restaurant)
+            if menu is None or not menu.items:
+                return None
+            entries = sorted(menu.items.values(), key=lambda entry: -entry['count'])[:limit]
+            listed = "; ".join(f"{entry['item']} {entry['amount']:g}" for entry in entries)
+            return f"Known items at {menu.name} (name price): {listed}"
+
+    def normalize_items(self, restaurant, items):
+        """
+        Rename items to their confirmed spelling and check prices against the catalog
+
+        Exact names and learned corrections are applied silently. A fuzzy match
+        is only applied when the price also agrees, and is reported so the user
+        can check it in Step 2.
+
+        Args:
+            restaurant (str): Restaurant name
+            items (list): List of items with 'item' and 'amount' keys
+
+        Returns:
+            tuple: (normalized items, warnings)
+        """
+        normalized = []
+        warnings = []
+        with self._lock:
+            menu = self._find_restaurant(restaurant)
+            if menu is None:
+                return items, []
+
+            for item in items:
+                entry, score = menu.lookup(item['item'])
+                if entry is None:
+                    normalized.append(item)
+                    continue
+
+                known = entry['amount']
+                price_agrees = not known or abs(item['amount'] - known) <= known * self.price_tolerance
+                if score < 1.0:
+                    if price_agrees:
+                        normalized.append(dict(item, item=entry['item']))
+                        warnings.append(
+                            f"Renamed \"{item['item']}\" to \"{entry['item']}\" from the {menu.name} menu - please check it is the same dish"
+                        )
+                    else:
+                        normalized.append(item)
+                    continue
+
+                normalized.append(dict(item, item=entry['item']))
+                if not price_agrees:
+                    warnings.append(
+                        f"{entry['item']} is usually ₹{known:.2f} at {menu.name}, but the bill shows ₹{item['amount']:.2f}"
+                    )
+        return normalized, warnings
+
+    def learn(self, restaurant, extracted_items, confirmed_items):
+        """
+        Record the items a user confirmed in Step 2
+
+        Rows are matched to what was extracted by their 'row_id', never by
+        position. A row the user renamed in Step 2 is remembered as a spelling
+        correction of the extracted name for the next bill from the same
+        restaurant, replacing any earlier correction for that name.
+
+        Args:
+            restaurant (str): Restaurant name
+            extracted_items (list): Extracted rows with 'row_id', the raw 'item'
+                name and the 'shown' name offered for review
+            confirmed_items (list): Rows after user edits, with 'row_id' for
+                rows that came from extraction
+
+        Returns:
+            bool: Whether anything was learned, i.e. whether the catalog needs saving
+        """
+        if not normalize_name(restaurant or ""):
+            return False
+
+        learned = False
+        with self._lock:
+            menu = self._find_restaurant(restaurant)
+            if menu is None:
+                menu = RestaurantMenu(restaurant.strip())
+                self.restaurants[normalize_name(restaurant)] = menu
+
+            for item in confirmed_items:
+                try:
+                    amount = float(item.get('amount'))
+                except (TypeError, ValueError):
+                    continue
+                if isinstance(item.get('item'), str) and item['item'].strip() and amount > 0:
+                    menu.add_item(item['item'].strip(), amount)
+                    learned = True
+
+            extracted_by_id = {}
+            for extracted in extracted_items:
+                row_id = row_id_of(extracted)
+                if row_id is not None:
+                    extracted_by_id[row_id] = extracted
+
+            for confirmed in confirmed_items:
+                extracted = extracted_by_id.get(row_id_of(confirmed))
+                fixed = confirmed.get('item')
+                if extracted is None or not isinstance(fixed, str) or not fixed.strip():
+                    continue
+                # Only names the user changed count as corrections
+                shown = extracted.get('shown', extracted.get('item'))
+                if normalize_name(fixed) != normalize_name(shown):
+                    menu.add_alias(extracted['item'], fixed.strip())
+                    learned = True
+
+        return learned
+
+    def save(self):
+        """Write the catalog to its JSON file"""
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        # Hold the lock while writing so concurrent saves cannot interleave,
+        # and write to a private temp file so a crash never leaves partial JSON
+        with self._lock:
+            data = [menu.to_dict() for menu in self.restaurants.values()]
+            with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as f:
+                json.dump(data, f)
+            os.replace(f.name, self.path)
@@ -0,0 +1,190 @@
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+# Session state keys that are persisted outside the Streamlit process
+SESSION_KEYS = [
+    'bill_items', 'people', 'assignments', 'manual_splits',
+    'coupon_discount', 'miscellaneous_charges', 'step',
+    'restaurant', 'extracted_items', 'price_warnings'
+]
+
+def _to_json(state):
+    """Serialize a session snapshot, unboxing numpy scalars coming from pandas"""
+    return json.dumps(state, default=lambda o: o.item() if hasattr(o, 'item') else str(o))
+
+class SessionStore(ABC):
+    """
+    Interface for storing a user's bill-splitting session outside st.session_state
+
+    Backends keep one JSON snapshot of SESSION_KEYS per session id and drop it
+    once it has not been saved for ttl seconds.
+    """
+    def __init__(self, ttl=6 * 60 * 60):
+        self.ttl = ttl
+
+    @abstractmethod
+    def load(self, session_id):
+        """
+        Load a saved session
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            dict: Saved state, or None if missing or expired
+        """
+
+    @abstractmethod
+    def save(self, session_id, state):
+        """
+        Save a session snapshot, refreshing its TTL
+
+        Args:
+            session_id (str): Session identifier
+            state (dict): Values for SESSION_KEYS
+        """
+
+    @abstractmethod
+    def delete(self, session_id):
+        """Remove a saved session"""
+
+    def flush(self):
+        """Write out any buffered saves"""
+        pass
+
+class MemorySessionStore(SessionStore):
+    """Per-process store, equivalent to plain st.session_state but surviving page reloads"""
+    def __init__(self, ttl=6 * 60 * 60, purge_every=100):
+        super().__init__(ttl)
+        self.purge_every = purge_every
+        self._sessions = {}
+        self._saves = 0
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[1] < time.time():
+                return None
+            return json.loads(entry[0])
+
+    def save(self, session_id, state):
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = (_to_json(state), now + self.ttl)
+            self._saves += 1
+            if self._saves % self.purge_every == 0:
+                self._sessions = {
+                    key: entry for key, entry in self._sessions.items() if entry[1] >= now
+                }
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Local SQLite store with write-behind batching
+
+    Saves are buffered in memory and written in one transaction once
+    batch_size sessions are dirty, and a background thread flushes every
+    flush_interval seconds, so a crash loses at most that window of edits.
+    Expired rows are purged on every flush.
+    """
+    def __init__(self, path="billease_sessions.db", ttl=6 * 60 * 60, batch_size=20, flush_interval=2.0):
+        super().__init__(ttl)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def load(self, session_id):
+        with self._lock:
+            # Buffered saves are newer than anything on disk
+            if session_id in self._pending:
+                entry = self._pending[session_id]
+            else:
+                entry = self._conn.execute(
+                    "SELECT state, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+        if entry is None or entry[1] < time.time():
+            return None
+        return json.loads(entry[0])
+
+    def save(self, session_id, state):
+        with self._lock:
+            self._pending[session_id] = (_to_json(state), time.time() + self.ttl)
+            due = len(self._pending) >= self.batch_size
+        if due:
+            self.flush()
+
+    def delete(self, session_id):
+        with self._lock:
+            # A None entry hides the row until the next flush deletes it
+            self._pending[session_id] = None
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            with self._conn:
+                for session_id, entry in pending.items():
+                    if entry is None:
+                        self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                    else:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO sessions (session_id, state, expires_at) VALUES (?, ?, ?)",
+                            (session_id, entry[0], entry[1])
+                        )
+                self._conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+
+    def close(self):
+        """Stop the background flusher and write out buffered saves"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        self._conn.close()
+
+class KeyValueSessionStore(SessionStore):
+    """
+    Store backed by a shared key-value service so several replicas can serve one user
+
+    The client needs get(key), set(key, value, ex=seconds) and delete(key),
+    which matches redis.Redis; the service handles TTL eviction itself.
+    """
+    def __init__(self, client, ttl=6 * 60 * 60, prefix="billease:session:"):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+
+    def load(self, session_id):
+        raw = self.client.get(self.prefix + session_id)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def save(self, session_id, state):
+        self.client.set(self.prefix + session_id, _to_json(state), ex=int(self.ttl))
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
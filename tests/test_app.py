@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+@pytest.fixture
+def step4(monkeypatch, tmp_path):
+    # Keep the menu catalog out of the working directory
+    monkeypatch.setenv("BILLEASE_MENU_CATALOG", str(tmp_path / "menu.json"))
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP_PATH)
+    at.session_state.bill_items = [{'item': "Pizza", 'amount': 100.0}]
+    at.session_state.people = ["A", "B", "C"]
+    at.session_state.assignments = {'item_0': ["A", "B"]}
+    at.session_state.manual_splits = {'item_0': {"A": 70.0, "B": 30.0}}
+    at.session_state.step = 4
+    return at.run()
+
+def test_restored_custom_split_stays_enabled(step4):
+    assert step4.checkbox(key="manual_0").value
+    assert step4.session_state.manual_splits['item_0'] == {"A": 70.0, "B": 30.0}
+
+def test_adding_person_resplits_custom_split(step4):
+    step4.multiselect(key="assign_0").set_value(["A", "B", "C"]).run()
+
+    split = step4.session_state.manual_splits['item_0']
+    assert set(split) == {"A", "B", "C"}
+    assert sum(split.values()) == pytest.approx(100.0)
+    assert step4.number_input(key="manual_0_C").value == pytest.approx(split["C"])
+
+def test_removing_person_drops_them_from_custom_split(step4):
+    step4.multiselect(key="assign_0").set_value(["A", "C"]).run()
+
+    split = step4.session_state.manual_splits['item_0']
+    assert set(split) == {"A", "C"}
+    assert sum(split.values()) == pytest.approx(100.0)
+
+def test_editing_amount_auto_splits_the_rest(step4):
+    step4.multiselect(key="assign_0").set_value(["A", "B", "C"]).run()
+    step4.number_input(key="manual_0_A").set_value(40.0).run()
+
+    assert step4.session_state.manual_splits['item_0'] == {"A": 40.0, "B": 30.0, "C": 30.0}
+    assert step4.number_input(key="manual_0_B").value == 30.0
+
+def test_unknown_session_store_is_rejected(monkeypatch):
+    monkeypatch.setenv("BILLEASE_SESSION_STORE", "sqlit")
+    # The store is a cached resource, so drop the one earlier tests created
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP_PATH).run()
+    st.cache_resource.clear()
+    assert at.exception
+    assert "BILLEASE_SESSION_STORE" in at.exception[0].message
+
+class RegionAnalyzer:
+    """BillAnalyzer stand-in returning the same two region items every time"""
+    def __init__(self, hedge=None):
+        self.restaurant = None
+
+    def extract_items(self, image_base64, menu_hint=None, region=False):
+        return [{'item': "Butter Naan", 'amount': 80.0}, {'item': "Gulab Jamun", 'amount': 60.0}]
+
+def test_rescanning_same_region_does_not_repeat_warnings(monkeypatch, tmp_path):
+    import io
+    import bill_analyzer
+    from PIL import Image
+    from menu_catalog import MenuCatalog
+
+    # A catalog that knows Butter Naan at ₹40, so the re-scan raises a price warning
+    catalog_path = str(tmp_path / "menu.json")
+    catalog = MenuCatalog(catalog_path)
+    catalog.learn("Cafe", [], [{'item': "Butter Naan", 'amount': 40.0}])
+    catalog.save()
+    monkeypatch.setenv("BILLEASE_MENU_CATALOG", catalog_path)
+    monkeypatch.setattr(bill_analyzer, "BillAnalyzer", RegionAnalyzer)
+    st.cache_resource.clear()
+
+    image = io.BytesIO()
+    Image.new("RGB", (40, 80), "white").save(image, format="PNG")
+    at = AppTest.from_file(APP_PATH)
+    at.session_state.bill_items = [{'item': "Paneer Tikka", 'amount': 180.0, 'row_id': 0}]
+    at.session_state.extracted_items = [{'row_id': 0, 'item': "Paneer Tikka", 'amount': 180.0, 'shown': "Paneer Tikka"}]
+    at.session_state.restaurant = "Cafe"
+    at.session_state.bill_image = image.getvalue()
+    at.session_state.step = 2
+    at.run()
+
+    for _ in range(2):
+        next(button for button in at.button if button.label == "🔍 Re-scan Region").click()
+        at.run()
+
+    assert [row['item'] for row in at.session_state.bill_items] == ["Paneer Tikka", "Butter Naan", "Gulab Jamun"]
+    assert len(at.session_state.price_warnings) == 1
@@ -0,0 +1,51 @@
+from bill_rows import merge_region_items, tag_extracted_rows, names_match, normalize_name
+
+def test_skips_exact_duplicates_and_adds_new_items():
+    existing = [{'item': "Butter Naan", 'amount': 40.0}, {'item': "Sweet Lassi", 'amount': 60.0}]
+    new = [{'item': "butter  naan", 'amount': 40.0}, {'item': "Gulab Jamun", 'amount': 80.0}]
+
+    merged, added = merge_region_items(existing, new)
+    assert added == [{'item': "Gulab Jamun", 'amount': 80.0}]
+    assert merged == existing + added
+
+def test_repeated_rows_on_the_bill_are_kept():
+    existing = [{'item': "Butter Naan", 'amount': 40.0}]
+    new = [{'item': "Butter Naan", 'amount': 40.0}, {'item': "Butter Naan", 'amount': 40.0}]
+
+    _, added = merge_region_items(existing, new)
+    assert added == [{'item': "Butter Naan", 'amount': 40.0}]
+
+def test_rows_corrected_by_the_user_are_not_added_again():
+    raw = [{'item': "Bulter Nan", 'amount': 40.0}, {'item': "Paneer Tikka", 'amount': 18.0}]
+    rows, extracted = tag_extracted_rows(raw, raw)
+    # The user fixed the name of row 0 and the price of row 1
+    edited = [dict(rows[0], item="Butter Naan"), dict(rows[1], amount=180.0)]
+
+    _, added = merge_region_items(edited, raw, extracted)
+    assert added == []
+
+def test_misspelling_with_small_price_difference_is_a_duplicate():
+    existing = [{'item': "Chicken Biryani", 'amount': 250.0}]
+    new = [{'item': "Chiken Biryani", 'amount': 255.0}]
+
+    _, added = merge_region_items(existing, new)
+    assert added == []
+
+def test_similar_name_with_different_price_is_added():
+    existing = [{'item': "Chicken Biryani", 'amount': 250.0}]
+    new = [{'item': "Chicken Biryani", 'amount': 500.0}, {'item': "Chicken 65", 'amount': 250.0}]
+
+    _, added = merge_region_items(existing, new)
+    assert added == new
+
+def test_rows_added_by_the_user_still_match():
+    existing = [{'item': "Masala Chai", 'amount': 30.0, 'row_id': float('nan')}]
+    new = [{'item': "Masala Chai", 'amount': 30.0}]
+
+    _, added = merge_region_items(existing, new, [])
+    assert added == []
+
+def test_names_match_allows_misspellings_of_the_same_dish_only():
+    assert names_match(normalize_name("Chiken Biryani"), normalize_name("Chicken Biryani"))
+    assert not names_match(normalize_name("Paneer Tikka"), normalize_name("Paneer Tikka Masala"))
+    assert not names_match(normalize_name("Veg Biryani"), normalize_name("Egg Biryani"))
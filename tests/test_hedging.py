@@ -0,0 +1,102 @@
+import asyncio
+import types
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("streamlit")
+
+import bill_analyzer
+from bill_analyzer import BillAnalyzer, HedgeStats
+
+class FakeAsyncOpenAI:
+    """AsyncOpenAI stand-in whose nth create() call follows the nth script entry"""
+    script = []
+
+    def __init__(self, api_key=None):
+        self.calls = 0
+        self.cancelled = []
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+        FakeAsyncOpenAI.last = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def create(self, **request):
+        call = self.calls
+        self.calls += 1
+        delay, result = self.script[call]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(call)
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = HedgeStats(min_samples=1, default_delay=0.05)
+    monkeypatch.setattr(bill_analyzer, "hedge_stats", stats)
+    monkeypatch.setattr(bill_analyzer, "AsyncOpenAI", FakeAsyncOpenAI)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return stats
+
+def run_hedged(script, delay=0.05):
+    FakeAsyncOpenAI.script = script
+    analyzer = BillAnalyzer(hedge=True)
+    return asyncio.run(analyzer._hedged_completion({}, delay))
+
+def test_primary_before_delay_sends_no_hedge(stats):
+    assert run_hedged([(0.0, "primary")]) == "primary"
+    assert FakeAsyncOpenAI.last.calls == 1
+    assert stats.hedges_fired == 0
+
+def test_hedge_wins_and_primary_is_cancelled(stats):
+    assert run_hedged([(1.0, "primary"), (0.01, "hedge")]) == "hedge"
+    assert FakeAsyncOpenAI.last.cancelled == [0]
+    assert stats.hedges_fired == 1
+    assert stats.hedges_won == 1
+    # The recorded latency covers the wait for the primary, not just the hedge
+    assert stats.snapshot()['p50_latency'] >= 0.05
+
+def test_primary_wins_after_hedge_and_hedge_is_cancelled(stats):
+    assert run_hedged([(0.08, "primary"), (1.0, "hedge")]) == "primary"
+    assert FakeAsyncOpenAI.last.cancelled == [1]
+    assert stats.hedges_won == 0
+
+def test_failed_task_falls_back_to_the_other(stats):
+    assert run_hedged([(0.08, RuntimeError("primary failed")), (0.2, "hedge")]) == "hedge"
+    assert stats.hedges_won == 1
+
+def test_both_failing_raises_first_error(stats):
+    with pytest.raises(RuntimeError, match="primary failed"):
+        run_hedged([(0.08, RuntimeError("primary failed")), (0.2, RuntimeError("hedge failed"))])
+
+def test_exhausted_budget_waits_for_primary(stats):
+    stats._tokens = 0.0
+    assert run_hedged([(0.1, "primary")]) == "primary"
+    assert FakeAsyncOpenAI.last.calls == 1
+    assert stats.hedges_denied == 1
+
+def test_budget_refills_per_request():
+    stats = HedgeStats(budget_ratio=0.5)
+    assert stats.try_acquire_hedge()
+    assert not stats.try_acquire_hedge()
+    stats.start_request()
+    assert not stats.try_acquire_hedge()
+    stats.start_request()
+    assert stats.try_acquire_hedge()
+    assert stats.hedges_fired == 2 and stats.hedges_denied == 2
+
+def test_default_delay_until_min_samples():
+    stats = HedgeStats(percentile=50, min_samples=3, default_delay=8.0)
+    stats.record_latency(1.0)
+    stats.record_latency(3.0)
+    assert stats.hedge_delay() == 8.0
+    stats.record_latency(2.0)
+    assert stats.hedge_delay() == 2.0
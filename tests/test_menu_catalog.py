@@ -0,0 +1,163 @@
+import json
+import threading
+
+from menu_catalog import MenuCatalog
+from bill_rows import tag_extracted_rows
+
+def confirm(catalog, restaurant, raw_items, confirmed_names):
+    """Run a bill through normalize/tag/learn, with the user renaming rows by row id"""
+    normalized, _ = catalog.normalize_items(restaurant, raw_items)
+    rows, extracted = tag_extracted_rows(raw_items, normalized)
+    confirmed = [
+        dict(row, item=confirmed_names[row['row_id']])
+        for row in rows if row['row_id'] in confirmed_names
+    ]
+    catalog.learn(restaurant, extracted, confirmed)
+    return confirmed
+
+def test_learns_correction_by_row_id():
+    catalog = MenuCatalog(None)
+    confirm(catalog, "Saravana Bhavan",
+            [{'item': "Bulter Nan", 'amount': 40.0}, {'item': "Sweet Lassi", 'amount': 60.0}],
+            {0: "Butter Naan", 1: "Sweet Lassi"})
+
+    items, warnings = catalog.normalize_items("saravana bhavan", [{'item': "Bulter Nan", 'amount': 40.0}])
+    assert items == [{'item': "Butter Naan", 'amount': 40.0}]
+    assert warnings == []
+
+def test_deleted_row_does_not_shift_corrections():
+    catalog = MenuCatalog(None)
+    raw = [
+        {'item': "Chicken Biryani", 'amount': 250.0},
+        {'item': "Mutton Biryani", 'amount': 320.0},
+        {'item': "Veg Biryani", 'amount': 180.0}
+    ]
+    # Row 0 deleted in Step 2, the rest kept as extracted
+    confirm(catalog, "Paradise", raw, {1: "Mutton Biryani", 2: "Veg Biryani"})
+
+    menu = catalog.find_restaurant("Paradise")
+    assert menu.aliases == {}
+    items, _ = catalog.normalize_items("Paradise", [{'item': "Chicken Biryani", 'amount': 250.0}])
+    assert items[0]['item'] == "Chicken Biryani"
+
+def test_user_edit_replaces_wrong_correction():
+    catalog = MenuCatalog(None)
+    confirm(catalog, "Cafe", [{'item': "Coffe", 'amount': 90.0}], {0: "Cold Coffee"})
+    confirm(catalog, "Cafe", [{'item': "Coffe", 'amount': 90.0}], {0: "Filter Coffee"})
+
+    items, _ = catalog.normalize_items("Cafe", [{'item': "Coffe", 'amount': 90.0}])
+    assert items[0]['item'] == "Filter Coffee"
+
+def test_accepted_fuzzy_rename_is_not_learned():
+    catalog = MenuCatalog(None)
+    confirm(catalog, "Dhaba", [{'item': "Paneer Tikka Masala", 'amount': 200.0}], {0: "Paneer Tikka Masala"})
+    # "Paneer Tikka Masla" is fuzzily renamed; the user keeps the rename
+    confirm(catalog, "Dhaba", [{'item': "Paneer Tikka Masla", 'amount': 200.0}], {0: "Paneer Tikka Masala"})
+
+    assert catalog.find_restaurant("Dhaba").aliases == {}
+
+def test_fuzzy_rename_is_reported():
+    catalog = MenuCatalog(None)
+    confirm(catalog, "Dhaba", [{'item': "Paneer Tikka Masala", 'amount': 200.0}], {0: "Paneer Tikka Masala"})
+
+    items, warnings = catalog.normalize_items("Dhaba", [{'item': "Paneer Tikka Masla", 'amount': 200.0}])
+    assert items[0]['item'] == "Paneer Tikka Masala"
+    assert len(warnings) == 1 and "Renamed" in warnings[0]
+
+def test_different_dishes_are_not_renamed():
+    catalog = MenuCatalog(None)
+    confirm(catalog, "Dhaba",
+            [{'item': "Paneer Tikka Masala", 'amount': 200.0}, {'item': "Chicken 65", 'amount': 220.0}],
+            {0: "Paneer Tikka Masala", 1: "Chicken 65"})
+
+    items, _ = catalog.normalize_items("Dhaba", [
+        {'item': "Paneer Tikka", 'amount': 180.0},
+        {'item': "Chicken 65 Dry", 'amount': 260.0}
+    ])
+    assert [item['item'] for item in items] == ["Paneer Tikka", "Chicken 65 Dry"]
+
+def test_fuzzy_match_needs_matching_price():
+    catalog = MenuCatalog(None)
+    confirm(catalog, "Dhaba", [{'item': "Paneer Tikka Masala", 'amount': 200.0}], {0: "Paneer Tikka Masala"})
+
+    items, warnings = catalog.normalize_items("Dhaba", [{'item': "Paneer Tikka Masla", 'amount': 400.0}])
+    assert items[0]['item'] == "Paneer Tikka Masla"
+    assert warnings == []
+
+def test_price_warning_for_known_item():
+    catalog = MenuCatalog(None)
+    confirm(catalog, "Cafe", [{'item': "Butter Naan", 'amount': 40.0}], {0: "Butter Naan"})
+
+    _, warnings = catalog.normalize_items("Cafe", [{'item': "Butter Naan", 'amount': 80.0}])
+    assert len(warnings) == 1 and "usually" in warnings[0]
+
+def test_added_rows_without_id_are_learned_as_items_only():
+    catalog = MenuCatalog(None)
+    catalog.learn("Cafe", [], [{'item': "Masala Chai", 'amount': 30.0, 'row_id': float('nan')}])
+
+    menu = catalog.find_restaurant("Cafe")
+    assert "masala chai" in menu.items
+    assert menu.aliases == {}
+
+def test_save_and_reload(tmp_path):
+    path = str(tmp_path / "menu.json")
+    catalog = MenuCatalog(path)
+    confirm(catalog, "Cafe", [{'item': "Bulter Nan", 'amount': 40.0}], {0: "Butter Naan"})
+    catalog.save()
+
+    reloaded = MenuCatalog(path)
+    items, _ = reloaded.normalize_items("Cafe", [{'item': "Bulter Nan", 'amount': 40.0}])
+    assert items[0]['item'] == "Butter Naan"
+    assert reloaded.menu_hint("Cafe") == "Known items at Cafe (name price): Butter Naan 40"
+
+def test_concurrent_saves_leave_valid_json(tmp_path):
+    path = str(tmp_path / "menu.json")
+    catalog = MenuCatalog(path)
+    confirm(catalog, "Cafe", [{'item': "Butter Naan", 'amount': 40.0}], {0: "Butter Naan"})
+
+    threads = [threading.Thread(target=catalog.save) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path) as f:
+        assert json.load(f)[0]['name'] == "Cafe"
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
+
+def test_corrupt_catalog_starts_empty(tmp_path):
+    path = tmp_path / "menu.json"
+    path.write_text('[{"name": "Cafe", "items"')
+
+    catalog = MenuCatalog(str(path))
+    assert catalog.restaurants == {}
+
+def test_learn_reports_whether_anything_changed():
+    catalog = MenuCatalog(None)
+    assert not catalog.learn("", [], [{'item': "Butter Naan", 'amount': 40.0}])
+    assert not catalog.learn("Cafe", [], [])
+    assert catalog.learn("Cafe", [], [{'item': "Butter Naan", 'amount': 40.0}])
+
+def test_reads_are_safe_while_learning_new_restaurants():
+    catalog = MenuCatalog(None)
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        try:
+            while not stop.is_set():
+                catalog.menu_hint("Restaurant 1")
+                catalog.normalize_items("Restaurant 2", [{'item': "Item", 'amount': 10.0}])
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(2000):
+        catalog.learn(f"Restaurant {i}", [], [{'item': f"Item {i}", 'amount': 10.0}])
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
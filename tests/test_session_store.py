@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from session_store import SessionStore, MemorySessionStore, SQLiteSessionStore, KeyValueSessionStore
+
+def test_memory_store_round_trip():
+    store = MemorySessionStore()
+    store.save("a", {'step': 2, 'people': ["Asha", "Ben"]})
+    assert store.load("a") == {'step': 2, 'people': ["Asha", "Ben"]}
+    store.delete("a")
+    assert store.load("a") is None
+
+def test_memory_store_ttl_eviction():
+    store = MemorySessionStore(ttl=0.05, purge_every=1)
+    store.save("old", {'step': 1})
+    time.sleep(0.1)
+    assert store.load("old") is None
+    store.save("new", {'step': 1})
+    assert "old" not in store._sessions
+
+def test_sqlite_store_flushes_in_background(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, batch_size=100, flush_interval=0.05)
+    other = SQLiteSessionStore(path, batch_size=100, flush_interval=0.05)
+    try:
+        store.save("a", {'step': 3})
+        # Buffered until the background flush, then visible to another replica
+        assert store.load("a") == {'step': 3}
+        time.sleep(0.3)
+        assert other.load("a") == {'step': 3}
+    finally:
+        store.close()
+        other.close()
+
+def test_sqlite_store_flushes_full_batch(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, batch_size=2, flush_interval=60)
+    other = SQLiteSessionStore(path, flush_interval=60)
+    try:
+        store.save("a", {'step': 1})
+        assert other.load("a") is None
+        store.save("b", {'step': 2})
+        assert other.load("a") == {'step': 1}
+        assert other.load("b") == {'step': 2}
+    finally:
+        store.close()
+        other.close()
+
+def test_sqlite_store_delete_and_ttl(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, ttl=0.05, flush_interval=60)
+    try:
+        store.save("a", {'step': 1})
+        store.delete("a")
+        assert store.load("a") is None
+        store.save("b", {'step': 1})
+        time.sleep(0.1)
+        assert store.load("b") is None
+        store.flush()
+        assert store._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 0
+    finally:
+        store.close()
+
+def test_sqlite_store_close_writes_pending(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, flush_interval=60)
+    store.save("a", {'step': 4})
+    store.close()
+    other = SQLiteSessionStore(path, flush_interval=60)
+    try:
+        assert other.load("a") == {'step': 4}
+    finally:
+        other.close()
+
+class FakeKeyValueClient:
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expiry[key] = ex
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+def test_key_value_store_uses_prefix_and_ttl():
+    client = FakeKeyValueClient()
+    store = KeyValueSessionStore(client, ttl=60)
+    store.save("a", {'step': 5})
+    assert client.expiry["billease:session:a"] == 60
+    assert store.load("a") == {'step': 5}
+    store.delete("a")
+    assert store.load("a") is None
+
+def test_session_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()